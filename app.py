@@ -12,12 +12,17 @@ not just what words they used.
 
 import os
 import json
+import logging
 from flask import Flask, render_template, request, jsonify, session
 from flask_cors import CORS
 from openai import AzureOpenAI
 from dotenv import load_dotenv
 
+from shared_cache import build_cache_from_env
+from token_budget import fit_input, max_output_tokens
+
 load_dotenv()
+logging.basicConfig(level=os.getenv("LOG_LEVEL", "INFO"))
 
 app = Flask(__name__)
 app.secret_key = os.urandom(24)
@@ -31,6 +36,25 @@ client = AzureOpenAI(
 )
 DEPLOYMENT_NAME = "gpt-4o-mini"
 
+# ─── Shared Cache (all workers on this host) ────────────────────────────────
+# Model answers are reused across Flask workers; see shared_cache.py.
+shared_cache = build_cache_from_env()
+
+# Bump a stage's version whenever its prompt changes, so answers cached under
+# the old prompt are not served. Deployment and max_tokens are keyed too.
+PROMPT_VERSIONS = {
+    "telecom_gate": 1,
+    "identify_subprocess": 1,
+    "detect_language": 1,
+    "generate_resolution": 1,
+    "translate_text": 1,
+}
+
+
+def cache_parts(stage: str, *inputs) -> tuple:
+    """Cache key parts for a stage: everything that changes the model's answer."""
+    return (stage, PROMPT_VERSIONS[stage], DEPLOYMENT_NAME, max_output_tokens(stage)) + inputs
+
 
 # ─── Telecom Sector Menu Structure ──────────────────────────────────────────
 # Each subprocess now has a "semantic_scope" that describes the MEANING of that
@@ -222,6 +246,7 @@ def is_telecom_related(query: str, sector_name: str = None, subprocess_name: str
     telecom-related. The model REASONS about the user's intent, not just
     whether telecom keywords appear.
     """
+    query = fit_input("telecom_gate", query)
     context_block = ""
     if sector_name:
         context_block = (
@@ -240,7 +265,7 @@ def is_telecom_related(query: str, sector_name: str = None, subprocess_name: str
             "'hospital appointment issue', 'my car insurance claim')."
         )
 
-    try:
+    def _classify():
         response = client.chat.completions.create(
             model=DEPLOYMENT_NAME,
             messages=[
@@ -271,7 +296,7 @@ def is_telecom_related(query: str, sector_name: str = None, subprocess_name: str
                 {"role": "user", "content": query},
             ],
             temperature=0,
-            max_tokens=120,
+            max_tokens=max_output_tokens("telecom_gate"),
         )
         raw = response.choices[0].message.content.strip()
         # Handle possible markdown wrapping
@@ -282,6 +307,10 @@ def is_telecom_related(query: str, sector_name: str = None, subprocess_name: str
             raw = raw.strip()
         result = json.loads(raw)
         return result.get("is_telecom", False)
+
+    try:
+        return shared_cache.get_or_compute(
+            "is_telecom", cache_parts("telecom_gate", query, sector_name, subprocess_name), _classify)
     except Exception as e:
         # If in a telecom menu flow, default to True (benefit of the doubt)
         if sector_name:
@@ -298,8 +327,9 @@ def identify_subprocess(query: str, sector_key: str) -> str:
     """
     sector = TELECOM_MENU[sector_key]
     subprocess_details = get_subprocess_details(sector_key)
+    query = fit_input("identify_subprocess", query)
 
-    try:
+    def _match():
         response = client.chat.completions.create(
             model=DEPLOYMENT_NAME,
             messages=[
@@ -329,7 +359,7 @@ def identify_subprocess(query: str, sector_key: str) -> str:
                 {"role": "user", "content": query},
             ],
             temperature=0,
-            max_tokens=200,
+            max_tokens=max_output_tokens("identify_subprocess"),
         )
         raw = response.choices[0].message.content.strip()
         if raw.startswith("```"):
@@ -339,14 +369,19 @@ def identify_subprocess(query: str, sector_key: str) -> str:
             raw = raw.strip()
         result = json.loads(raw)
         return result.get("matched_subprocess", "General Inquiry")
+
+    try:
+        return shared_cache.get_or_compute("subprocess", cache_parts("identify_subprocess", query, sector_key), _match)
     except Exception:
         return "General Inquiry"
 
 
 # ─── Helper: Detect language ────────────────────────────────────────────────
 def detect_language(text: str) -> str:
-    """Detect the language of user input."""
-    try:
+    """Detect the language of user input. A short head is enough to tell."""
+    text = fit_input("detect_language", text)
+
+    def _detect():
         response = client.chat.completions.create(
             model=DEPLOYMENT_NAME,
             messages=[
@@ -362,7 +397,7 @@ def detect_language(text: str) -> str:
                 {"role": "user", "content": text},
             ],
             temperature=0,
-            max_tokens=50,
+            max_tokens=max_output_tokens("detect_language"),
         )
         raw = response.choices[0].message.content.strip()
         if raw.startswith("```"):
@@ -372,6 +407,9 @@ def detect_language(text: str) -> str:
             raw = raw.strip()
         result = json.loads(raw)
         return result.get("language", "English")
+
+    try:
+        return shared_cache.get_or_compute("language", cache_parts("detect_language", text), _detect)
     except Exception:
         return "English"
 
@@ -379,7 +417,9 @@ def detect_language(text: str) -> str:
 # ─── Helper: Generate resolution steps ──────────────────────────────────────
 def generate_resolution(query: str, sector_name: str, subprocess_name: str, language: str) -> str:
     """Generate step-by-step resolution for the user's telecom complaint."""
-    try:
+    query = fit_input("generate_resolution", query)
+
+    def _generate():
         response = client.chat.completions.create(
             model=DEPLOYMENT_NAME,
             messages=[
@@ -402,9 +442,14 @@ def generate_resolution(query: str, sector_name: str, subprocess_name: str, lang
                 {"role": "user", "content": query},
             ],
             temperature=0.4,
-            max_tokens=1000,
+            max_tokens=max_output_tokens("generate_resolution"),
         )
         return response.choices[0].message.content.strip()
+
+    try:
+        return shared_cache.get_or_compute(
+            "resolution", cache_parts("generate_resolution", query, sector_name, subprocess_name, language),
+            _generate)
     except Exception as e:
         return f"I apologize, but I encountered an error generating the resolution. Please try again. Error: {str(e)}"
 
@@ -414,7 +459,8 @@ def translate_text(text: str, target_language: str) -> str:
     """Translate system messages to user's detected language."""
     if target_language.lower() in ("english", "en"):
         return text
-    try:
+
+    def _translate():
         response = client.chat.completions.create(
             model=DEPLOYMENT_NAME,
             messages=[
@@ -425,9 +471,12 @@ def translate_text(text: str, target_language: str) -> str:
                 {"role": "user", "content": text},
             ],
             temperature=0,
-            max_tokens=500,
+            max_tokens=max_output_tokens("translate_text"),
         )
         return response.choices[0].message.content.strip()
+
+    try:
+        return shared_cache.get_or_compute("translation", cache_parts("translate_text", text, target_language), _translate)
     except Exception:
         return text
 
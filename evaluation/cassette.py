@@ -0,0 +1,109 @@
+"""
+Record / Replay Cassette Store
+==============================
+A drop-in stand-in for `client` in app.py. It exposes the same
+`client.chat.completions.create(...)` call the helpers use.
+
+  - record: forwards each request to the real Azure OpenAI client and stores
+    the answer, token usage and latency under a hash of the request.
+  - replay: answers from the stored cassette only — no network at all.
+    Requests that were never recorded count as misses and raise CassetteMiss.
+"""
+
+import hashlib
+import json
+import os
+import time
+from types import SimpleNamespace
+
+
+class CassetteMiss(KeyError):
+    """Raised in replay mode when a request was never recorded."""
+
+
+class CassetteClient:
+    def __init__(self, path: str, mode: str = "replay", real_client=None):
+        if mode not in ("record", "replay"):
+            raise ValueError(f"Unknown cassette mode: {mode}")
+        if mode == "record" and real_client is None:
+            raise ValueError("Record mode needs a real client to forward requests to")
+
+        self.path = path
+        self.mode = mode
+        self.real_client = real_client
+        self.entries = {}
+        if os.path.exists(path):
+            with open(path, encoding="utf-8") as f:
+                self.entries = json.load(f)
+
+        # Running totals; the harness snapshots these around each stage call
+        self.calls = 0
+        self.misses = 0
+        self.prompt_tokens = 0
+        self.completion_tokens = 0
+        # Recorded upstream latency of answers served from the cassette
+        self.replayed_ms = 0.0
+
+        self.chat = SimpleNamespace(completions=SimpleNamespace(create=self._create))
+
+    @staticmethod
+    def request_key(request: dict) -> str:
+        payload = json.dumps(request, ensure_ascii=False, sort_keys=True)
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    def _create(self, **kwargs):
+        request = {
+            "model": kwargs.get("model"),
+            "messages": kwargs.get("messages"),
+            "temperature": kwargs.get("temperature"),
+            "max_tokens": kwargs.get("max_tokens"),
+        }
+        key = self.request_key(request)
+        self.calls += 1
+
+        entry = self.entries.get(key)
+        if entry is None:
+            if self.mode == "replay":
+                self.misses += 1
+                raise CassetteMiss(key)
+            entry = self._record(key, request, kwargs)
+        else:
+            self.replayed_ms += entry["latency_ms"]
+
+        self.prompt_tokens += entry["prompt_tokens"]
+        self.completion_tokens += entry["completion_tokens"]
+        return _as_response(entry)
+
+    def _record(self, key: str, request: dict, kwargs: dict) -> dict:
+        start = time.perf_counter()
+        response = self.real_client.chat.completions.create(**kwargs)
+        latency_ms = (time.perf_counter() - start) * 1000
+        usage = getattr(response, "usage", None)
+        entry = {
+            "request": request,
+            "content": response.choices[0].message.content,
+            "prompt_tokens": getattr(usage, "prompt_tokens", 0) or 0,
+            "completion_tokens": getattr(usage, "completion_tokens", 0) or 0,
+            "latency_ms": round(latency_ms, 1),
+        }
+        self.entries[key] = entry
+        return entry
+
+    def save(self):
+        """Write the cassette back to disk (record mode only)."""
+        if self.mode != "record":
+            return
+        os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+        with open(self.path, "w", encoding="utf-8") as f:
+            json.dump(self.entries, f, ensure_ascii=False, indent=2, sort_keys=True)
+
+
+def _as_response(entry: dict):
+    """Shape a stored entry like an openai ChatCompletion object."""
+    return SimpleNamespace(
+        choices=[SimpleNamespace(message=SimpleNamespace(content=entry["content"]))],
+        usage=SimpleNamespace(
+            prompt_tokens=entry["prompt_tokens"],
+            completion_tokens=entry["completion_tokens"],
+        ),
+    )
@@ -0,0 +1,263 @@
+"""
+Classification Quality-vs-Latency Harness
+=========================================
+Offline evaluation of the three classification stages in app.py:
+  - telecom_gate -> is_telecom_related()
+  - subprocess   -> identify_subprocess()
+  - language     -> detect_language()
+
+Each CONFIGURATION maps those stages to an implementation. The labelled
+corpus (corpus.jsonl) is run through every configuration and the report
+gives accuracy, confusion matrices, latency and token cost per stage. This
+is the data we need to judge a faster tier against the LLM.
+
+Model answers come from a record/replay cassette, so replay needs no network:
+  python -m evaluation.harness                         # replay (default)
+  python -m evaluation.harness --mode record           # (re)record; needs Azure credentials
+  python -m evaluation.harness --configs llm --json report.json
+
+Run from the repository root.
+"""
+
+import argparse
+import json
+import os
+import statistics
+import sys
+import time
+from collections import Counter, defaultdict
+
+# Measure the model, not the shared cache
+os.environ["CACHE_BACKEND"] = "none"
+
+import app  # noqa: E402
+from evaluation.cassette import CassetteClient  # noqa: E402
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+DEFAULT_CORPUS = os.path.join(HERE, "corpus.jsonl")
+DEFAULT_CASSETTE = os.path.join(HERE, "cassettes", f"{app.DEPLOYMENT_NAME}.json")
+
+# gpt-4o-mini list prices, USD per 1K tokens
+DEFAULT_INPUT_PRICE_PER_1K = 0.00015
+DEFAULT_OUTPUT_PRICE_PER_1K = 0.0006
+
+# Names the model may give to code-mixed text -> the dominant language we label
+LANGUAGE_ALIASES = {
+    "hinglish": "Hindi",
+    "hindi-english": "Hindi",
+    "tanglish": "Tamil",
+    "tamil-english": "Tamil",
+    "banglish": "Bengali",
+    "bangla": "Bengali",
+    "marathi-english": "Marathi",
+    "castellano": "Spanish",
+    "español": "Spanish",
+    "français": "French",
+}
+
+
+# ─── Stage implementations ──────────────────────────────────────────────────
+def _menu_context(item: dict):
+    """Sector / subprocess names the gate would see in the menu flow."""
+    sector = app.TELECOM_MENU.get(item.get("sector_key") or "", {})
+    sector_name = sector.get("name")
+    return sector_name, ("Others" if sector_name else None)
+
+
+def _llm_gate(item: dict) -> bool:
+    sector_name, subprocess_name = _menu_context(item)
+    return app.is_telecom_related(item["text"], sector_name=sector_name, subprocess_name=subprocess_name)
+
+
+def _fallback_gate(item: dict) -> bool:
+    # What is_telecom_related() returns when the model is unreachable
+    sector_name, _ = _menu_context(item)
+    return bool(sector_name)
+
+
+# Each configuration maps stage -> callable(item). Register faster tiers here.
+CONFIGURATIONS = {
+    "llm": {
+        "telecom_gate": _llm_gate,
+        "subprocess": lambda item: app.identify_subprocess(item["text"], item["sector_key"]),
+        "language": lambda item: app.detect_language(item["text"]),
+    },
+    "fallback": {
+        "telecom_gate": _fallback_gate,
+        "subprocess": lambda item: "General Inquiry",
+        "language": lambda item: "English",
+    },
+}
+
+# Stage -> corpus label field; items whose label is null are skipped for that stage
+STAGE_LABELS = {
+    "telecom_gate": "is_telecom",
+    "subprocess": "subprocess",
+    "language": "language",
+}
+
+
+def normalize(stage: str, value):
+    if stage == "telecom_gate":
+        return bool(value)
+    value = str(value).strip()
+    if stage == "language":
+        value = LANGUAGE_ALIASES.get(value.lower(), value.title())
+    return value
+
+
+# ─── Corpus ─────────────────────────────────────────────────────────────────
+def load_corpus(path: str) -> list:
+    with open(path, encoding="utf-8") as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+# ─── Evaluation ─────────────────────────────────────────────────────────────
+def _percentile(values: list, pct: float) -> float:
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))
+    return ordered[index]
+
+
+def evaluate_stage(stage: str, fn, corpus: list, cassette: CassetteClient,
+                   input_price: float, output_price: float) -> dict:
+    label_field = STAGE_LABELS[stage]
+    confusion = defaultdict(Counter)
+    by_tag = defaultdict(lambda: [0, 0])
+    latencies = []
+    correct = 0
+    misses = []
+    start_totals = (cassette.calls, cassette.prompt_tokens, cassette.completion_tokens)
+
+    items = [item for item in corpus if item.get(label_field) is not None]
+    for item in items:
+        misses_before = cassette.misses
+        replayed_before = cassette.replayed_ms
+
+        start = time.perf_counter()
+        predicted = normalize(stage, fn(item))
+        wall_ms = (time.perf_counter() - start) * 1000
+
+        if cassette.misses > misses_before:
+            # The app answered with its fallback, not the model — don't score it
+            misses.append(item["id"])
+            continue
+        latencies.append(wall_ms + cassette.replayed_ms - replayed_before)
+
+        gold = normalize(stage, item[label_field])
+        confusion[str(gold)][str(predicted)] += 1
+        hit = predicted == gold
+        correct += hit
+        for tag in item.get("tags", []):
+            by_tag[tag][0] += hit
+            by_tag[tag][1] += 1
+
+    calls = cassette.calls - start_totals[0]
+    prompt_tokens = cassette.prompt_tokens - start_totals[1]
+    completion_tokens = cassette.completion_tokens - start_totals[2]
+    scored = len(items) - len(misses)
+    return {
+        "n": len(items),
+        "scored": scored,
+        # None when nothing could be scored, so summaries can't show a fake number
+        "accuracy": correct / scored if scored else None,
+        "accuracy_by_tag": {tag: c / t for tag, (c, t) in sorted(by_tag.items())},
+        "confusion": {gold: dict(preds) for gold, preds in sorted(confusion.items())},
+        "latency_ms": {
+            "mean": statistics.mean(latencies) if latencies else 0.0,
+            "p50": _percentile(latencies, 50),
+            "p95": _percentile(latencies, 95),
+        },
+        "calls": calls,
+        "prompt_tokens": prompt_tokens,
+        "completion_tokens": completion_tokens,
+        "cost_usd": prompt_tokens / 1000 * input_price + completion_tokens / 1000 * output_price,
+        "cassette_misses": misses,
+    }
+
+
+def run(config_names: list, corpus: list, cassette: CassetteClient,
+        input_price: float, output_price: float) -> dict:
+    # Every model call in app.py now goes through the cassette
+    app.client = cassette
+    report = {}
+    for name in config_names:
+        stages = CONFIGURATIONS[name]
+        report[name] = {
+            stage: evaluate_stage(stage, fn, corpus, cassette, input_price, output_price)
+            for stage, fn in stages.items()
+        }
+    return report
+
+
+# ─── Reporting ──────────────────────────────────────────────────────────────
+def print_report(report: dict):
+    for name, stages in report.items():
+        print("\n" + "=" * 72)
+        print(f"  CONFIGURATION: {name}")
+        print("=" * 72)
+        for stage, r in stages.items():
+            lat = r["latency_ms"]
+            accuracy = "n/a" if r["accuracy"] is None else f"{r['accuracy']:.1%}"
+            print(f"\n── {stage} ── n={r['n']}  scored={r['scored']}  accuracy={accuracy}")
+            print(f"  latency ms : mean {lat['mean']:.1f} | p50 {lat['p50']:.1f} | p95 {lat['p95']:.1f}")
+            print(f"  tokens     : {r['calls']} calls, {r['prompt_tokens']} in / "
+                  f"{r['completion_tokens']} out, ${r['cost_usd']:.5f}")
+            if r["accuracy_by_tag"]:
+                tags = ", ".join(f"{t} {a:.0%}" for t, a in r["accuracy_by_tag"].items())
+                print(f"  by tag     : {tags}")
+            print("  confusion  (gold -> predicted × count):")
+            for gold, preds in r["confusion"].items():
+                cells = ", ".join(f"{p} ×{c}" for p, c in sorted(preds.items(), key=lambda kv: -kv[1]))
+                print(f"    {gold} -> {cells}")
+            if r["cassette_misses"]:
+                print(f"  ⚠️  cassette misses (not scored): {len(r['cassette_misses'])} "
+                      f"({', '.join(r['cassette_misses'][:5])}{' ...' if len(r['cassette_misses']) > 5 else ''})")
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Offline quality-vs-latency evaluation of the classification stages.")
+    parser.add_argument("--mode", choices=("replay", "record"), default="replay")
+    parser.add_argument("--configs", default=",".join(CONFIGURATIONS),
+                        help=f"Comma-separated configurations (available: {', '.join(CONFIGURATIONS)})")
+    parser.add_argument("--corpus", default=DEFAULT_CORPUS)
+    parser.add_argument("--cassette", default=DEFAULT_CASSETTE)
+    parser.add_argument("--input-price-per-1k", type=float, default=DEFAULT_INPUT_PRICE_PER_1K)
+    parser.add_argument("--output-price-per-1k", type=float, default=DEFAULT_OUTPUT_PRICE_PER_1K)
+    parser.add_argument("--json", dest="json_path", help="Also write the full report as JSON")
+    parser.add_argument("--allow-misses", action="store_true",
+                        help="Don't fail when replay hits requests missing from the cassette")
+    args = parser.parse_args(argv)
+
+    config_names = [c.strip() for c in args.configs.split(",") if c.strip()]
+    unknown = [c for c in config_names if c not in CONFIGURATIONS]
+    if unknown:
+        parser.error(f"Unknown configuration(s): {', '.join(unknown)}")
+
+    if args.mode == "replay" and not os.path.exists(args.cassette):
+        print(f"⚠️  No cassette at {args.cassette} — model-backed stages can't be scored. "
+              "Record one with --mode record (needs Azure credentials).")
+
+    cassette = CassetteClient(args.cassette, mode=args.mode,
+                              real_client=app.client if args.mode == "record" else None)
+    report = run(config_names, load_corpus(args.corpus), cassette,
+                 args.input_price_per_1k, args.output_price_per_1k)
+    cassette.save()
+    print_report(report)
+
+    if args.json_path:
+        with open(args.json_path, "w", encoding="utf-8") as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+        print(f"\nJSON report written to {args.json_path}")
+
+    if cassette.misses and not args.allow_misses:
+        print(f"\n❌ {cassette.misses} request(s) were not in the cassette and were left out of "
+              "the scores. Re-record with --mode record.")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,354 @@
+"""
+Shared Cache Tier
+=================
+A cache that every Flask worker process on the same host can read and write,
+so a translation / language detection / classification / resolution computed
+by one worker is immediately reusable by all the others (including freshly
+started, "cold" workers).
+
+Backends (selected with the CACHE_BACKEND environment variable):
+  - "sqlite" (default): a single SQLite file in WAL mode shared by all local
+    workers. Acts as the local stand-in for a cache daemon — no extra service.
+  - "redis": any Redis-protocol server (Redis, Valkey, KeyDB, ...). Requires
+    the optional `redis` package and REDIS_URL.
+  - "none": caching disabled; every lookup goes straight to the loader.
+
+Every backend gives:
+  - Bounded size with LRU eviction (CACHE_MAX_ENTRIES) and TTL expiry
+    (CACHE_TTL_SECONDS).
+  - Stampede protection: on a miss only ONE worker (across all processes)
+    holds a lease and calls the upstream model; the others wait for the value
+    to appear instead of issuing duplicate calls. The lease carries an owner
+    token and is renewed while the call runs, so a slow call never loses it.
+"""
+
+import hashlib
+import json
+import logging
+import os
+import sqlite3
+import tempfile
+import threading
+import time
+import uuid
+
+logger = logging.getLogger(__name__)
+
+
+# ─── Defaults ───────────────────────────────────────────────────────────────
+DEFAULT_SQLITE_PATH = os.path.join(tempfile.gettempdir(), "telecom-chatbot-cache.sqlite3")
+DEFAULT_MAX_ENTRIES = 10000
+DEFAULT_TTL_SECONDS = 24 * 60 * 60
+# Renewed every third of its length while the loader runs
+DEFAULT_LOCK_LEASE_SECONDS = 30
+# Longer than the Azure client's 600 s default timeout
+DEFAULT_LOCK_WAIT_SECONDS = 660
+# Hits refresh their LRU timestamp at most this often, so reads stay read-only
+LRU_TOUCH_INTERVAL_SECONDS = 60
+POLL_INTERVAL_SECONDS = 0.05
+# How long writes wait for SQLite's write lock
+BUSY_TIMEOUT_SECONDS = 5
+
+
+# ─── Backend: SQLite file shared by all local workers ───────────────────────
+class SQLiteBackend:
+    """
+    Host-local shared store. SQLite handles cross-process locking for us, and
+    WAL mode lets readers proceed while one worker is writing.
+    """
+
+    def __init__(self, path: str, max_entries: int):
+        self.path = path
+        self.max_entries = max_entries
+        self._local = threading.local()
+        self._init_schema()
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(self.path, timeout=BUSY_TIMEOUT_SECONDS)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        return conn
+
+    def _conn(self) -> sqlite3.Connection:
+        # One connection per thread and per process — sqlite3 connections must
+        # be neither shared between threads nor inherited across fork()
+        pid = os.getpid()
+        if getattr(self._local, "pid", None) != pid:
+            self._local.conn = self._connect()
+            self._local.pid = pid
+        return self._local.conn
+
+    def _init_schema(self):
+        # Short-lived connection: this runs at import time, possibly before a
+        # pre-forking server (gunicorn --preload) forks its workers
+        conn = self._connect()
+        try:
+            with conn:
+                conn.execute(
+                    "CREATE TABLE IF NOT EXISTS entries ("
+                    "key TEXT PRIMARY KEY, value TEXT NOT NULL, "
+                    "expires_at REAL NOT NULL, accessed_at REAL NOT NULL)"
+                )
+                conn.execute("CREATE INDEX IF NOT EXISTS idx_entries_accessed ON entries (accessed_at)")
+                conn.execute(
+                    "CREATE TABLE IF NOT EXISTS leases ("
+                    "key TEXT PRIMARY KEY, token TEXT NOT NULL, expires_at REAL NOT NULL)"
+                )
+        finally:
+            conn.close()
+
+    def get(self, key: str):
+        """Return (hit, value). Expired entries count as a miss."""
+        now = time.time()
+        conn = self._conn()
+        row = conn.execute(
+            "SELECT value, expires_at, accessed_at FROM entries WHERE key = ?", (key,)
+        ).fetchone()
+        if row is None:
+            return False, None
+        value, expires_at, accessed_at = row
+        if expires_at <= now:
+            return False, None  # set() sweeps expired rows
+        if now - accessed_at >= LRU_TOUCH_INTERVAL_SECONDS:
+            # Coarse LRU touch. Don't wait for the write lock: if another
+            # worker is writing, skip the touch rather than delay the hit
+            conn.execute("PRAGMA busy_timeout = 0")
+            try:
+                with conn:
+                    conn.execute("UPDATE entries SET accessed_at = ? WHERE key = ?", (now, key))
+            except sqlite3.OperationalError:
+                pass
+            finally:
+                conn.execute(f"PRAGMA busy_timeout = {int(BUSY_TIMEOUT_SECONDS * 1000)}")
+        return True, json.loads(value)
+
+    def set(self, key: str, value, ttl: float):
+        now = time.time()
+        with self._conn() as conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO entries (key, value, expires_at, accessed_at) "
+                "VALUES (?, ?, ?, ?)",
+                (key, json.dumps(value), now + ttl, now),
+            )
+            # Evict expired entries first, then least-recently-used overflow
+            conn.execute("DELETE FROM entries WHERE expires_at <= ?", (now,))
+            conn.execute(
+                "DELETE FROM entries WHERE key IN ("
+                "SELECT key FROM entries ORDER BY accessed_at DESC LIMIT -1 OFFSET ?)",
+                (self.max_entries,),
+            )
+
+    def acquire_lock(self, key: str, token: str, lease: float) -> bool:
+        """Try to take the fill lease for `key` as `token`. Expired leases are reclaimed."""
+        now = time.time()
+        with self._conn() as conn:
+            conn.execute("DELETE FROM leases WHERE key = ? AND expires_at <= ?", (key, now))
+            cur = conn.execute(
+                "INSERT OR IGNORE INTO leases (key, token, expires_at) VALUES (?, ?, ?)",
+                (key, token, now + lease),
+            )
+            return cur.rowcount == 1
+
+    def renew_lock(self, key: str, token: str, lease: float) -> bool:
+        with self._conn() as conn:
+            cur = conn.execute(
+                "UPDATE leases SET expires_at = ? WHERE key = ? AND token = ?",
+                (time.time() + lease, key, token),
+            )
+            return cur.rowcount == 1
+
+    def is_locked(self, key: str) -> bool:
+        row = self._conn().execute(
+            "SELECT 1 FROM leases WHERE key = ? AND expires_at > ?", (key, time.time())
+        ).fetchone()
+        return row is not None
+
+    def release_lock(self, key: str, token: str):
+        with self._conn() as conn:
+            conn.execute("DELETE FROM leases WHERE key = ? AND token = ?", (key, token))
+
+
+# ─── Backend: Redis-protocol server ─────────────────────────────────────────
+class RedisBackend:
+    """
+    Pluggable Redis-protocol backend. TTL is native; size is bounded by the
+    server's own eviction policy (configure `maxmemory` with
+    `maxmemory-policy allkeys-lru`), since Redis already does LRU for us.
+    """
+
+    KEY_PREFIX = "telecom-chatbot:"
+
+    # Compare-and-delete / compare-and-extend, so only the lease owner can touch it
+    _RELEASE_SCRIPT = (
+        "if redis.call('get', KEYS[1]) == ARGV[1] then "
+        "return redis.call('del', KEYS[1]) else return 0 end"
+    )
+    _RENEW_SCRIPT = (
+        "if redis.call('get', KEYS[1]) == ARGV[1] then "
+        "return redis.call('pexpire', KEYS[1], ARGV[2]) else return 0 end"
+    )
+
+    def __init__(self, url: str):
+        import redis  # optional dependency, only needed for this backend
+
+        self.client = redis.Redis.from_url(url)
+        self._release = self.client.register_script(self._RELEASE_SCRIPT)
+        self._renew = self.client.register_script(self._RENEW_SCRIPT)
+
+    def _lock_key(self, key: str) -> str:
+        return self.KEY_PREFIX + "lock:" + key
+
+    def get(self, key: str):
+        raw = self.client.get(self.KEY_PREFIX + key)
+        if raw is None:
+            return False, None
+        return True, json.loads(raw)
+
+    def set(self, key: str, value, ttl: float):
+        self.client.set(self.KEY_PREFIX + key, json.dumps(value), ex=max(1, int(ttl)))
+
+    def acquire_lock(self, key: str, token: str, lease: float) -> bool:
+        return bool(self.client.set(self._lock_key(key), token, nx=True, px=int(lease * 1000)))
+
+    def renew_lock(self, key: str, token: str, lease: float) -> bool:
+        return bool(self._renew(keys=[self._lock_key(key)], args=[token, int(lease * 1000)]))
+
+    def is_locked(self, key: str) -> bool:
+        return bool(self.client.exists(self._lock_key(key)))
+
+    def release_lock(self, key: str, token: str):
+        self._release(keys=[self._lock_key(key)], args=[token])
+
+
+# ─── Cache front-end with stampede protection ───────────────────────────────
+class SharedCache:
+    """Namespaced get-or-compute on top of a backend."""
+
+    def __init__(self, backend=None, ttl_seconds: float = DEFAULT_TTL_SECONDS,
+                 lock_lease_seconds: float = DEFAULT_LOCK_LEASE_SECONDS,
+                 lock_wait_seconds: float = DEFAULT_LOCK_WAIT_SECONDS):
+        self.backend = backend
+        self.ttl_seconds = ttl_seconds
+        self.lock_lease_seconds = lock_lease_seconds
+        self.lock_wait_seconds = lock_wait_seconds
+
+    @staticmethod
+    def make_key(namespace: str, *parts) -> str:
+        """Stable key: namespace + hash of the JSON-encoded inputs."""
+        payload = json.dumps(parts, ensure_ascii=False, sort_keys=True)
+        return f"{namespace}:{hashlib.sha256(payload.encode('utf-8')).hexdigest()}"
+
+    def get_or_compute(self, namespace: str, parts: tuple, loader, ttl: float = None):
+        """
+        Return the cached value for (namespace, parts), calling `loader()` on
+        a miss. Only one caller across all workers runs the loader for a
+        given key; the rest wait for its result. If `loader` raises, nothing
+        is cached and the exception propagates to the caller.
+        """
+        if self.backend is None:
+            return loader()
+
+        key = self.make_key(namespace, *parts)
+        ttl = self.ttl_seconds if ttl is None else ttl
+
+        hit, value = self._safe_get(key)
+        if hit:
+            return value
+
+        deadline = time.time() + self.lock_wait_seconds
+        while True:
+            token = uuid.uuid4().hex
+            if self._safe_acquire(key, token):
+                stop = threading.Event()
+                keeper = threading.Thread(target=self._keep_lease, args=(key, token, stop), daemon=True)
+                keeper.start()
+                try:
+                    # Another worker may have filled it between our miss and the lock
+                    hit, value = self._safe_get(key)
+                    if hit:
+                        return value
+                    value = loader()
+                    self._safe_set(key, value, ttl)
+                    return value
+                finally:
+                    stop.set()
+                    keeper.join()  # no renewal in flight once we release
+                    self._safe_release(key, token)
+
+            # Someone else is filling this key — wait for their result
+            while time.time() < deadline:
+                time.sleep(POLL_INTERVAL_SECONDS)
+                hit, value = self._safe_get(key)
+                if hit:
+                    return value
+                if not self._safe_is_locked(key):
+                    break  # holder gave up (e.g. upstream error) — try to take over
+            else:
+                # Waited past any upstream timeout; don't block the request any further
+                logger.warning("Shared cache: gave up waiting for %s, calling upstream", key)
+                return loader()
+
+    def _keep_lease(self, key: str, token: str, stop: threading.Event):
+        """Renew the fill lease until the loader finishes."""
+        while not stop.wait(self.lock_lease_seconds / 3):
+            try:
+                if not self.backend.renew_lock(key, token, self.lock_lease_seconds):
+                    logger.warning("Shared cache: lost fill lease for %s", key)
+                    return
+            except Exception as e:
+                logger.warning("Shared cache: lease renewal failed for %s: %s", key, e)
+
+    # The cache must never take the chatbot down: backend errors degrade to a miss
+    def _safe_get(self, key):
+        try:
+            return self.backend.get(key)
+        except Exception as e:
+            logger.warning("Shared cache get failed, treating as miss: %s", e)
+            return False, None
+
+    def _safe_set(self, key, value, ttl):
+        try:
+            self.backend.set(key, value, ttl)
+        except Exception as e:
+            logger.warning("Shared cache set failed: %s", e)
+
+    def _safe_acquire(self, key, token) -> bool:
+        try:
+            return self.backend.acquire_lock(key, token, self.lock_lease_seconds)
+        except Exception as e:
+            logger.warning("Shared cache lease unavailable, computing without it: %s", e)
+            return True
+
+    def _safe_is_locked(self, key) -> bool:
+        try:
+            return self.backend.is_locked(key)
+        except Exception as e:
+            logger.warning("Shared cache lease check failed: %s", e)
+            return False
+
+    def _safe_release(self, key, token):
+        try:
+            self.backend.release_lock(key, token)
+        except Exception as e:
+            logger.warning("Shared cache lease release failed: %s", e)
+
+
+def build_cache_from_env() -> SharedCache:
+    """Create the shared cache configured by CACHE_* / REDIS_URL env vars."""
+    backend_name = os.getenv("CACHE_BACKEND", "sqlite").strip().lower()
+    ttl = float(os.getenv("CACHE_TTL_SECONDS", DEFAULT_TTL_SECONDS))
+    max_entries = int(os.getenv("CACHE_MAX_ENTRIES", DEFAULT_MAX_ENTRIES))
+
+    backend = None
+    try:
+        if backend_name == "sqlite":
+            backend = SQLiteBackend(os.getenv("CACHE_PATH", DEFAULT_SQLITE_PATH), max_entries)
+        elif backend_name == "redis":
+            backend = RedisBackend(os.getenv("REDIS_URL", "redis://localhost:6379/0"))
+        elif backend_name != "none":
+            logger.warning("Unknown CACHE_BACKEND '%s', caching disabled", backend_name)
+    except Exception as e:
+        logger.warning("Shared cache '%s' backend unavailable, caching disabled: %s", backend_name, e)
+        backend = None
+
+    return SharedCache(backend, ttl_seconds=ttl)
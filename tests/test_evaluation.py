@@ -0,0 +1,102 @@
+import json
+from types import SimpleNamespace
+
+import pytest
+
+pytest.importorskip("flask")
+pytest.importorskip("openai")
+
+from evaluation import harness  # noqa: E402
+from evaluation.cassette import CassetteClient  # noqa: E402
+from shared_cache import SharedCache  # noqa: E402
+
+CORPUS = [
+    {"id": "bill", "text": "charged twice for my postpaid bill", "sector_key": "1",
+     "is_telecom": True, "subprocess": "Billing & Payment Issues", "language": "English", "tags": ["en"]},
+    {"id": "pizza", "text": "my pizza arrived cold", "sector_key": None,
+     "is_telecom": False, "subprocess": None, "language": "English", "tags": ["negative"]},
+]
+
+
+class FakeAzure:
+    """Answers like the model would, keyed on which helper is asking."""
+
+    def __init__(self):
+        self.chat = SimpleNamespace(completions=SimpleNamespace(create=self.create))
+
+    def create(self, **kwargs):
+        system = kwargs["messages"][0]["content"]
+        user = kwargs["messages"][1]["content"]
+        if "Detect the language" in system:
+            content = '{"language": "English", "code": "en"}'
+        elif "semantic intent" in system:
+            content = json.dumps({"reasoning": "-", "is_telecom": "pizza" not in user})
+        else:
+            content = '{"reasoning": "-", "matched_subprocess": "Billing & Payment Issues", "confidence": 0.9}'
+        message = SimpleNamespace(content=content)
+        usage = SimpleNamespace(prompt_tokens=100, completion_tokens=10)
+        return SimpleNamespace(choices=[SimpleNamespace(message=message)], usage=usage)
+
+
+@pytest.fixture(autouse=True)
+def isolated_app(monkeypatch):
+    # run() swaps app.client for the cassette; keep the shared cache out of it
+    monkeypatch.setattr(harness.app, "client", harness.app.client)
+    monkeypatch.setattr(harness.app, "shared_cache", SharedCache(None))
+
+
+def _record(path, corpus):
+    cassette = CassetteClient(str(path), mode="record", real_client=FakeAzure())
+    harness.run(["llm"], corpus, cassette, 0.00015, 0.0006)
+    cassette.save()
+
+
+def _replay(path, corpus):
+    cassette = CassetteClient(str(path), mode="replay")
+    return harness.run(["llm"], corpus, cassette, 0.00015, 0.0006)["llm"]
+
+
+def test_replayed_answers_are_scored(tmp_path):
+    path = tmp_path / "cassette.json"
+    _record(path, CORPUS)
+    report = _replay(path, CORPUS)
+
+    gate = report["telecom_gate"]
+    assert gate["scored"] == gate["n"] == 2
+    assert gate["accuracy"] == 1.0
+    assert gate["confusion"] == {"True": {"True": 1}, "False": {"False": 1}}
+    assert gate["cassette_misses"] == []
+    assert gate["calls"] == 2 and gate["prompt_tokens"] == 200
+    assert report["subprocess"]["accuracy"] == 1.0
+
+
+def test_misses_are_excluded_and_listed(tmp_path):
+    path = tmp_path / "cassette.json"
+    _record(path, CORPUS[:1])
+    gate = _replay(path, CORPUS)["telecom_gate"]
+
+    assert gate["n"] == 2 and gate["scored"] == 1
+    assert gate["cassette_misses"] == ["pizza"]
+    assert gate["confusion"] == {"True": {"True": 1}}
+    assert gate["accuracy"] == 1.0
+
+
+def test_accuracy_is_none_when_nothing_scored(tmp_path):
+    report = _replay(tmp_path / "missing.json", CORPUS)
+    for stage in report.values():
+        assert stage["scored"] == 0
+        assert stage["accuracy"] is None
+
+
+def test_main_fails_on_misses_unless_allowed(tmp_path):
+    corpus_path = tmp_path / "corpus.jsonl"
+    corpus_path.write_text("\n".join(json.dumps(item) for item in CORPUS), encoding="utf-8")
+    cassette_path = tmp_path / "cassette.json"
+    _record(cassette_path, CORPUS[:1])
+
+    args = ["--configs", "llm", "--corpus", str(corpus_path), "--cassette", str(cassette_path)]
+    assert harness.main(args) == 1
+    assert harness.main(args + ["--allow-misses"]) == 0
+
+    _record(cassette_path, CORPUS)
+    assert harness.main(args) == 0
@@ -0,0 +1,142 @@
+import logging
+import multiprocessing
+import os
+import sqlite3
+import threading
+import time
+
+import pytest
+
+import shared_cache
+from shared_cache import SharedCache, SQLiteBackend, build_cache_from_env
+
+
+def _cache(path, max_entries=100, ttl=60, lease=30):
+    return SharedCache(SQLiteBackend(str(path), max_entries), ttl_seconds=ttl, lock_lease_seconds=lease)
+
+
+def _slow_loader(calls_file, seconds):
+    def loader():
+        with open(calls_file, "a") as f:
+            f.write("call\n")
+        time.sleep(seconds)
+        return {"answer": 42}
+    return loader
+
+
+def _count_calls(calls_file):
+    if not os.path.exists(calls_file):
+        return 0
+    with open(calls_file) as f:
+        return len(f.readlines())
+
+
+def _worker(db_path, calls_file, lease, seconds):
+    cache = _cache(db_path, lease=lease)
+    return cache.get_or_compute("ns", ("popular",), _slow_loader(calls_file, seconds))
+
+
+def test_max_entries_bound(tmp_path):
+    cache = _cache(tmp_path / "cache.sqlite3", max_entries=3)
+    for i in range(10):
+        cache.get_or_compute("ns", (i,), lambda i=i: i)
+
+    count = cache.backend._conn().execute("SELECT COUNT(*) FROM entries").fetchone()[0]
+    assert count == 3
+    # The most recent entries survive
+    assert cache.backend.get(cache.make_key("ns", 9)) == (True, 9)
+    assert cache.backend.get(cache.make_key("ns", 0)) == (False, None)
+
+
+def test_ttl_expiry(tmp_path):
+    cache = _cache(tmp_path / "cache.sqlite3", ttl=0.1)
+    assert cache.get_or_compute("ns", ("k",), lambda: "first") == "first"
+    assert cache.get_or_compute("ns", ("k",), lambda: "second") == "first"
+    time.sleep(0.2)
+    assert cache.get_or_compute("ns", ("k",), lambda: "third") == "third"
+
+
+def test_failed_loader_is_not_cached(tmp_path):
+    cache = _cache(tmp_path / "cache.sqlite3")
+
+    def boom():
+        raise RuntimeError("upstream down")
+
+    with pytest.raises(RuntimeError):
+        cache.get_or_compute("ns", ("k",), boom)
+    assert cache.get_or_compute("ns", ("k",), lambda: "ok") == "ok"
+
+
+def test_single_loader_call_across_threads(tmp_path):
+    db_path, calls_file = tmp_path / "cache.sqlite3", str(tmp_path / "calls")
+    results = []
+
+    def run():
+        # Separate cache + backend per thread, like separate workers
+        results.append(_worker(db_path, calls_file, lease=30, seconds=0.3))
+
+    threads = [threading.Thread(target=run) for _ in range(8)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+    assert results == [{"answer": 42}] * 8
+    assert _count_calls(calls_file) == 1
+
+
+def test_hit_does_not_wait_for_busy_writer(tmp_path, monkeypatch):
+    monkeypatch.setattr(shared_cache, "LRU_TOUCH_INTERVAL_SECONDS", 0)
+    db_path = tmp_path / "cache.sqlite3"
+    cache = _cache(db_path)
+    cache.get_or_compute("ns", ("k",), lambda: "cached")
+
+    writer = sqlite3.connect(str(db_path), isolation_level=None)
+    writer.execute("BEGIN IMMEDIATE")  # hold the write lock
+    try:
+        start = time.perf_counter()
+        assert cache.get_or_compute("ns", ("k",), lambda: "recomputed") == "cached"
+        assert time.perf_counter() - start < 1
+    finally:
+        writer.execute("ROLLBACK")
+        writer.close()
+
+
+def test_unknown_backend_is_logged(monkeypatch, caplog):
+    monkeypatch.setenv("CACHE_BACKEND", "redsi")
+    with caplog.at_level(logging.WARNING, logger=shared_cache.__name__):
+        cache = build_cache_from_env()
+    assert cache.backend is None
+    assert "Unknown CACHE_BACKEND 'redsi'" in caplog.text
+
+
+def test_single_loader_call_when_loader_outlives_lease(tmp_path, caplog):
+    db_path, calls_file = tmp_path / "cache.sqlite3", str(tmp_path / "calls")
+    results = []
+
+    def run():
+        results.append(_worker(db_path, calls_file, lease=0.2, seconds=1.0))
+
+    threads = [threading.Thread(target=run) for _ in range(4)]
+    with caplog.at_level(logging.WARNING, logger=shared_cache.__name__):
+        for t in threads:
+            t.start()
+            time.sleep(0.05)
+        for t in threads:
+            t.join()
+
+    assert results == [{"answer": 42}] * 4
+    assert _count_calls(calls_file) == 1
+    assert "lost fill lease" not in caplog.text
+
+
+def test_single_loader_call_across_processes(tmp_path):
+    db_path, calls_file = tmp_path / "cache.sqlite3", str(tmp_path / "calls")
+    _cache(db_path)  # create the schema before the workers start
+
+    ctx = multiprocessing.get_context("spawn")
+    with ctx.Pool(4) as pool:
+        results = pool.starmap(_worker, [(db_path, calls_file, 0.2, 1.0)] * 4)
+
+    assert results == [{"answer": 42}] * 4
+    assert _count_calls(calls_file) == 1
@@ -0,0 +1,71 @@
+import logging
+
+import token_budget
+from token_budget import condense, count_tokens, fit_input, max_output_tokens
+
+
+RANT = " ".join(["My internet is terrible and nobody helps."] * 200) + " Please refund me now."
+
+
+def test_env_overrides_are_read_after_import(monkeypatch):
+    # app.py loads .env after importing token_budget
+    assert max_output_tokens("detect_language") == 50
+    monkeypatch.setenv("OUTPUT_TOKENS_PER_SECOND", "50")
+    monkeypatch.setenv("TOKEN_BUDGET_DETECT_LANGUAGE_INPUT", "8")
+    assert max_output_tokens("detect_language") == 25
+    assert count_tokens(fit_input("detect_language", RANT)) <= 8
+
+
+def test_condense_keeps_head_and_tail():
+    out = condense(RANT, 100)
+    assert count_tokens(out) <= 100
+    assert out.startswith("My internet")
+    assert out.endswith("Please refund me now.")
+
+
+def test_condense_small_cap_keeps_a_head():
+    for cap in range(1, 6):
+        out = condense(RANT, cap)
+        assert out and count_tokens(out) <= cap
+        assert out.startswith("My")
+
+
+def test_no_truncation_log_when_text_fits(caplog, monkeypatch):
+    monkeypatch.setenv("TOKEN_BUDGET_GENERATE_RESOLUTION_INPUT", "50")
+    with caplog.at_level(logging.INFO, logger=token_budget.__name__):
+        assert fit_input("generate_resolution", "Internet   down\t\tsince  morning") == "Internet   down\t\tsince  morning"
+        fit_input("generate_resolution", RANT)
+    assert len(caplog.records) == 1
+    assert "Truncated generate_resolution" in caplog.records[0].getMessage()
+
+
+CJK = "我的手机从昨天开始就没有信号了，打电话总是断线，上网也非常慢。" * 6
+
+
+def test_cjk_is_counted_per_character():
+    assert count_tokens(CJK) == len(CJK)
+
+
+def test_cjk_head_is_cut_inside_the_run():
+    out = fit_input("detect_language", CJK)
+    assert out == CJK[:64]
+
+
+def test_cjk_condense_keeps_head_and_tail():
+    out = fit_input("generate_resolution", CJK * 20)
+    assert count_tokens(out) <= 1024
+    assert out.startswith("我的手机") and out.endswith("非常慢。")
+
+
+def test_emoji_run_is_cut_not_emptied():
+    out = fit_input("detect_language", "😡" * 200)
+    assert out and set(out) == {"😡"}
+    assert count_tokens(out) <= 64
+
+
+def test_fit_input_never_returns_empty_text(monkeypatch):
+    for stage, cap in (("telecom_gate", "1"), ("generate_resolution", "3"), ("generate_resolution", "20")):
+        monkeypatch.setenv(f"TOKEN_BUDGET_{stage.upper()}_INPUT", cap)
+        for text in (CJK, "😡" * 50, "a" * 500, RANT):
+            out = fit_input(stage, text)
+            assert out.replace("[…]", "").strip()
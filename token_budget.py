@@ -0,0 +1,181 @@
+"""
+Token Budgeting
+===============
+Keeps every prompt bounded. Each model call in app.py is a "stage" with:
+  - an input cap: how many tokens of the user's text the stage may see.
+    Detection and gating only need a short head; classification and
+    generation get a condensed version (head + tail) of long complaints.
+  - an output budget: `max_tokens` is derived from a latency budget
+    (and optionally a cost budget) instead of being hardcoded.
+
+Tokens are counted locally with a BPE-style estimator (no tokenizer files and
+no network). It errs slightly on the high side, which is the safe direction
+for budgets.
+
+Every budget can be overridden from the environment (read on each call, so
+values from .env apply whenever it is loaded), e.g.
+  TOKEN_BUDGET_GENERATE_RESOLUTION_INPUT=800
+  TOKEN_BUDGET_GENERATE_RESOLUTION_LATENCY_MS=8000
+  TOKEN_BUDGET_GENERATE_RESOLUTION_COST_USD=0.0005
+"""
+
+import logging
+import math
+import os
+import re
+import unicodedata
+
+logger = logging.getLogger(__name__)
+
+# Output throughput of the deployment; turns a latency budget into max_tokens.
+# Overridden by OUTPUT_TOKENS_PER_SECOND.
+DEFAULT_OUTPUT_TOKENS_PER_SECOND = 100
+# gpt-4o-mini list price, USD per 1K output tokens; used for cost budgets.
+# Overridden by OUTPUT_PRICE_PER_1K.
+DEFAULT_OUTPUT_PRICE_PER_1K = 0.0006
+# Never starve a stage below this — JSON replies need room to close
+MIN_OUTPUT_TOKENS = 16
+# Below this cap there is no room for head + ellipsis + tail; keep the head only
+MIN_CONDENSE_TOKENS = 16
+
+ELLIPSIS = " […] "
+
+# ─── Per-stage budgets ──────────────────────────────────────────────────────
+# input_tokens: cap on user text (None = never truncate)
+# strategy:     "head" keeps the beginning, "condense" keeps head + tail
+# latency_ms:   target generation time -> max_tokens
+# cost_usd:     optional per-call output cost cap -> max_tokens
+STAGE_BUDGETS = {
+    "detect_language": {"input_tokens": 64, "strategy": "head", "latency_ms": 500, "cost_usd": None},
+    "telecom_gate": {"input_tokens": 256, "strategy": "head", "latency_ms": 1200, "cost_usd": None},
+    "identify_subprocess": {"input_tokens": 384, "strategy": "condense", "latency_ms": 2000, "cost_usd": None},
+    "generate_resolution": {"input_tokens": 1024, "strategy": "condense", "latency_ms": 10000, "cost_usd": None},
+    # Translated text is our own UI copy and must come back whole
+    "translate_text": {"input_tokens": None, "strategy": "head", "latency_ms": 5000, "cost_usd": None},
+}
+
+
+def stage_budget(stage: str) -> dict:
+    """The stage's budget with any TOKEN_BUDGET_<STAGE>_* overrides applied."""
+    budget = dict(STAGE_BUDGETS[stage])
+    prefix = f"TOKEN_BUDGET_{stage.upper()}_"
+    if os.getenv(prefix + "INPUT"):
+        budget["input_tokens"] = int(os.getenv(prefix + "INPUT"))
+    if os.getenv(prefix + "LATENCY_MS"):
+        budget["latency_ms"] = float(os.getenv(prefix + "LATENCY_MS"))
+    if os.getenv(prefix + "COST_USD"):
+        budget["cost_usd"] = float(os.getenv(prefix + "COST_USD"))
+    return budget
+
+
+# ─── Local token counting ───────────────────────────────────────────────────
+# Pieces: ASCII letters in chunks of up to 16, digits in groups of 3, single
+# non-ASCII characters, single punctuation marks. Pieces are small, so cuts
+# can land inside long words and unspaced scripts (CJK, Thai, emoji runs).
+# Whitespace is folded into the following piece, as BPE tokenizers do.
+_PIECE_RE = re.compile(r"[A-Za-z]{1,16}|[0-9]{1,3}|[^\x00-\x7f\s]|[^\sA-Za-z0-9]")
+
+
+def _piece_cost(piece: str) -> int:
+    first = piece[0]
+    if first.isascii():
+        if first.isalpha():
+            return math.ceil(len(piece) / 4)  # common English words are one token
+        return 1
+    if unicodedata.category(first).startswith("M"):
+        return 0  # combining marks (Devanagari vowel signs, accents) ride on their base
+    if ord(first) > 0xFFFF:
+        return 2  # emoji and other astral characters take several byte-level tokens
+    return 1  # CJK, Devanagari, Tamil, ... — about a token per character or less
+
+
+def count_tokens(text: str) -> int:
+    """Estimate the number of model tokens in `text` without any network call."""
+    return sum(_piece_cost(m.group()) for m in _PIECE_RE.finditer(text or ""))
+
+
+def _head(text: str, max_tokens: int) -> str:
+    used, end = 0, 0
+    for m in _PIECE_RE.finditer(text):
+        used += _piece_cost(m.group())
+        if used > max_tokens:
+            break
+        end = m.end()
+    return text[:end].rstrip()
+
+
+def _tail(text: str, max_tokens: int) -> str:
+    pieces = list(_PIECE_RE.finditer(text))
+    used, start = 0, len(text)
+    for m in reversed(pieces):
+        used += _piece_cost(m.group())
+        if used > max_tokens:
+            break
+        start = m.start()
+    # Don't start on a combining mark whose base character was cut off
+    while start < len(text) and unicodedata.category(text[start]).startswith("M"):
+        start += 1
+    return text[start:].lstrip()
+
+
+def truncate_head(text: str, max_tokens: int) -> str:
+    """Keep only the first `max_tokens` tokens of `text`."""
+    if count_tokens(text) <= max_tokens:
+        return text
+    return _head(text, max_tokens)
+
+
+def condense(text: str, max_tokens: int) -> str:
+    """
+    Shrink `text` to about `max_tokens`: collapse whitespace, then keep the
+    opening (where people state the problem) and the closing (where they
+    state what they want), eliding the middle.
+    """
+    text = re.sub(r"[ \t]+", " ", text)
+    text = re.sub(r"\n\s*\n+", "\n\n", text).strip()
+    if count_tokens(text) <= max_tokens:
+        return text
+    if max_tokens < MIN_CONDENSE_TOKENS:
+        return _head(text, max_tokens)
+    tail_tokens = max_tokens // 3
+    head_tokens = max_tokens - tail_tokens - count_tokens(ELLIPSIS)
+    return _head(text, head_tokens) + ELLIPSIS + _tail(text, tail_tokens)
+
+
+# ─── Stage helpers used by app.py ───────────────────────────────────────────
+def fit_input(stage: str, text: str) -> str:
+    """Apply the stage's input cap to user text, logging any truncation."""
+    budget = stage_budget(stage)
+    limit = budget["input_tokens"]
+    if limit is None or not text:
+        return text
+    original_tokens = count_tokens(text)
+    if original_tokens <= limit:
+        return text
+
+    if budget["strategy"] == "condense":
+        fitted = condense(text, limit)
+    else:
+        fitted = truncate_head(text, limit)
+    if not fitted.replace(ELLIPSIS.strip(), "").strip():
+        # Never send the model an empty message: fall back to a character cut
+        fitted = text.strip()[:max(1, limit)]
+    fitted_tokens = count_tokens(fitted)
+    if fitted_tokens >= original_tokens:
+        return fitted  # only whitespace changed
+    logger.info(
+        "Truncated %s input from %d to %d tokens (%s)",
+        stage, original_tokens, fitted_tokens, budget["strategy"],
+    )
+    return fitted
+
+
+def max_output_tokens(stage: str) -> int:
+    """`max_tokens` for a stage from its latency budget and optional cost budget."""
+    budget = stage_budget(stage)
+    tokens_per_second = float(os.getenv("OUTPUT_TOKENS_PER_SECOND", DEFAULT_OUTPUT_TOKENS_PER_SECOND))
+    tokens = int(budget["latency_ms"] / 1000 * tokens_per_second)
+    if budget["cost_usd"] is not None:
+        price_per_1k = float(os.getenv("OUTPUT_PRICE_PER_1K", DEFAULT_OUTPUT_PRICE_PER_1K))
+        tokens = min(tokens, int(budget["cost_usd"] / price_per_1k * 1000))
+    return max(MIN_OUTPUT_TOKENS, tokens)